@@ -6,16 +6,55 @@ creation, authentication, and data product state updates.
 """
 
 from argparse import ArgumentParser
-from collections.abc import Callable
-from random import choice
-from time import sleep
-from typing import Any
+from collections.abc import Callable, Collection
+from itertools import islice
+from random import randrange
+from threading import Lock
+from time import monotonic, time
+from typing import Any, ClassVar
 from uuid import UUID
 
-from locust import HttpUser, between, events, tag, task
+from gevent import sleep
+from locust import FastHttpUser, between, events, tag, task
+from pydantic import TypeAdapter
 
-from model import Auth, AuthLogin, DataProductPut, Plan, PlanPost, RunMode, State
-from setup import generate_plan_payload
+from model import Auth, AuthLogin, DataProductPut, Plan, PlanState, RunMode, State
+from setup import generate_plan_body
+
+# Built once so each request skips serializer / validator setup
+_DATA_PRODUCT_PUT_ADAPTER: TypeAdapter[list[DataProductPut]] = TypeAdapter(
+    list[DataProductPut]
+)
+_UUID_LIST_ADAPTER: TypeAdapter[list[UUID]] = TypeAdapter(list[UUID])
+
+# Headers for requests with a pre-serialized JSON body
+_JSON_HEADERS: dict[str, str] = {"Content-Type": "application/json"}
+
+# Guards the shared token, so only one user authenticates at a time
+_AUTH_LOCK: Lock = Lock()
+
+# Seconds before a shared token expires that we stop handing it to new users
+_AUTH_EXPIRY_MARGIN: int = 60
+
+
+def choose(*buckets: Collection[UUID]) -> UUID | None:
+    """Pick uniformly from several collections without concatenating them.
+
+    Args:
+        buckets: Collections of IDs to choose from
+
+    Returns:
+        UUID | None: The chosen ID, or None if every bucket is empty
+
+    """
+    pick: int = randrange(sum(len(bucket) for bucket in buckets) or 1)  # noqa: S311
+
+    for bucket in buckets:
+        if pick < len(bucket):
+            return next(islice(bucket, pick, None))
+        pick -= len(bucket)
+
+    return None
 
 
 @events.init_command_line_parser.add_listener
@@ -45,39 +84,116 @@ def add_custom_arguments(parser: ArgumentParser) -> None:
         default=60,
         help="If mode is `loop`, how long to wait before dataset is cleared",
     )
+    parser.add_argument(
+        "--shared_auth",
+        action="store_true",
+        help="Share one auth token across users in a process, renewed as it expires",
+    )
 
 
-class FletcherUser(HttpUser):
+class FletcherUser(FastHttpUser):
     """Locust user class for load testing Fletcher API."""
 
     wait_time: Callable = between(1, 3)
 
+    # Token shared by every user in this process, if `--shared_auth` is set, and
+    # when it expires (Unix timestamp)
+    _shared_auth_header: ClassVar[str] = ""
+    _shared_auth_expires: ClassVar[int] = 0
+
+    @classmethod
+    def reset_shared_auth(cls, **_kwargs: object) -> None:
+        """Forget the shared token, so the next user to start logs in again."""
+        with _AUTH_LOCK:
+            cls._shared_auth_header = ""
+            cls._shared_auth_expires = 0
+
     def on_start(self) -> None:
         """Initialize the user by authenticating and creating a test plan."""
+        auth_header: str
+        if self.environment.parsed_options.shared_auth:
+            with _AUTH_LOCK:
+                # Log in again once the shared token is (nearly) expired
+                if time() >= FletcherUser._shared_auth_expires - _AUTH_EXPIRY_MARGIN:
+                    auth: Auth = self.authenticate()
+                    FletcherUser._shared_auth_header = f"Bearer {auth.access_token}"
+                    FletcherUser._shared_auth_expires = auth.expires
+                auth_header = FletcherUser._shared_auth_header
+        else:
+            auth_header = f"Bearer {self.authenticate().access_token}"
+
+        # The token is good for the life of the user, so have the session send it
+        self.client.auth_header = auth_header
+
+        # What is out plan?
+        plan_payload: str = generate_plan_body()
+
+        # Register our plan
+        response: bytes = self.client.post(
+            url="/api/plan",
+            data=plan_payload,
+            headers=_JSON_HEADERS,
+        ).content
+
+        plan: Plan = Plan.model_validate_json(response)
+
+        # Format our dataset's URLs once, rather than on every request
+        dataset_id: str = str(plan.dataset.id)
+        self._search_params: dict[str, Any] = {"page": 0, "search_by": dataset_id}
+        self._plan_url: str = f"/plan/{dataset_id}"
+        self._update_url: str = f"/api/data_product/{dataset_id}/update"
+        self._clear_url: str = f"/api/data_product/{dataset_id}/clear"
+
+        # The plan's layout never changes, so keep just the parts we need as flat
+        # indexes rather than holding on to the whole model
+        self._dp_ids: tuple[UUID, ...] = tuple(dp.id for dp in plan.data_products)
+        self._eager_ids: frozenset[UUID] = frozenset(
+            dp.id for dp in plan.data_products if dp.eager
+        )
+        self._children_of: dict[UUID, list[UUID]] = {}
+        for dep in plan.dependencies:
+            self._children_of.setdefault(dep.parent_id, []).append(dep.child_id)
+
+        # Clearing always covers every data product, so serialize its body once
+        self._clear_payload: str = _UUID_LIST_ADAPTER.dump_json(
+            list(self._dp_ids)
+        ).decode()
+
+        # How many parents each data product is still waiting on to succeed
+        self._pending_parents: dict[UUID, int] = dict.fromkeys(self._dp_ids, 0)
+        for dep in plan.dependencies:
+            self._pending_parents[dep.child_id] += 1
+
+        # Data products we can act on, kept up to date as states change
+        self._queued_eager: set[UUID] = set()
+        self._ready_noneager: set[UUID] = set()
+        self._running: dict[UUID, float] = {}  # When we saw each step start running
+
+        self._state_by_id: dict[UUID, State] = {}
+        self._index_states({dp.id: dp.state for dp in plan.data_products})
+
+        # Serialized state update bodies, by data product ID and new state
+        self._update_payloads: dict[tuple[UUID, State], str] = {}
+
+    def authenticate(self) -> Auth:
+        """Authenticate against the API.
+
+        Returns:
+            Auth: Access token and when it expires
+
+        """
         auth_payload: AuthLogin = AuthLogin(
             service=self.environment.parsed_options.service,
             key=self.environment.parsed_options.key,
         )
 
-        # Authenticate against the API
-        auth_response: dict[str, Any] = self.client.post(
+        auth_response: bytes = self.client.post(
             url="/api/authenticate",
-            json=auth_payload.model_dump(mode="json"),
-        ).json()
+            data=auth_payload.model_dump_json(),
+            headers=_JSON_HEADERS,
+        ).content
 
-        self.auth: Auth = Auth.model_validate(auth_response)
-
-        # What is out plan?
-        plan_payload: PlanPost = generate_plan_payload()
-
-        # Register our plan
-        response: dict[str, Any] = self.client.post(
-            url="/api/plan",
-            json=plan_payload.model_dump(mode="json"),
-            headers={"Authorization": f"Bearer {self.auth.access_token}"},
-        ).json()
-
-        self.plan: Plan = Plan.model_validate(response)
+        return Auth.model_validate_json(auth_response)
 
     @task
     @tag("ui")
@@ -90,12 +206,12 @@ class FletcherUser(HttpUser):
         # Search the home page
         self.client.get(
             "/component/plan_search",
-            params={"page": 0, "search_by": self.plan.dataset.id},
+            params=self._search_params,
         )
         self.wait()
 
         # Load the page for our dataset
-        self.client.get(f"/plan/{self.plan.dataset.id}")
+        self.client.get(self._plan_url)
 
     @task(4)
     @tag("api")
@@ -106,66 +222,44 @@ class FletcherUser(HttpUser):
             RuntimeError: If a data product is in an unexpected state.
 
         """
-        # What at the next eager step we can trigger?
-        next_eager_dp: list[UUID] = [
-            dp.id
-            for dp in self.plan.data_products
-            if dp.eager and dp.state == State.QUEUED
-        ]
-
-        # What at the next non-eager step we can trigger?
-        next_noneager_dp: list[UUID] = [
-            dp.id
-            for dp in self.plan.data_products
-            if not dp.eager
-            and dp.state == State.WAITING
-            # All upsteam steps must be "success"
-            and all(
-                next(
-                    dp2.state == State.SUCCESS
-                    for dp2 in self.plan.data_products
-                    if dp2.id == dep.parent_id
-                )
-                for dep in self.plan.dependencies
-                if dep.child_id == dp.id
-            )
+        # Running steps are done once they have had time to process their data
+        started_before: float = (
+            monotonic() - self.environment.parsed_options.processing_delay
+        )
+        next_done_dp: list[UUID] = [
+            dp_id
+            for dp_id, started in self._running.items()
+            if started <= started_before
         ]
 
-        # What steps are currently running?
-        next_running_dp: list[UUID] = [
-            dp.id for dp in self.plan.data_products if dp.state == State.RUNNING
-        ]
+        # Pick one of the next eager, next non-eager, or done running steps
+        dp_id: UUID | None = choose(
+            self._queued_eager,
+            self._ready_noneager,
+            next_done_dp,
+        )
 
-        # Pick one
-        dp_id: UUID = choice(next_eager_dp + next_noneager_dp + next_running_dp)  # noqa: S311
+        # Nothing to do until a running step is done processing
+        if dp_id is None:
+            return
 
         # Selected data products state
-        state: State = next(
-            dp.state for dp in self.plan.data_products if dp.id == dp_id
-        )
+        state: State = self._state_by_id[dp_id]
 
         # What to do with our Data product
-        match state:
-            # Lets set to running
-            case State.WAITING | State.QUEUED:
-                self.update_data_product(dp_id=dp_id, state=State.RUNNING)
-
-                # Simulate the running of content
-                sleep(self.environment.parsed_options.processing_delay)
+        transition: Callable[[FletcherUser, UUID], None] | None = _TRANSITIONS.get(
+            state
+        )
 
-            # Set state to done
-            case State.RUNNING:
-                self.update_data_product(dp_id=dp_id, state=State.SUCCESS)
+        # Well, we should not end up here
+        if transition is None:
+            error_msg = f"Somehow got Data Product ID: {dp_id}, State: {state}"
+            raise RuntimeError(error_msg)
 
-            # Well, we should not end up here
-            case _:
-                error_msg = f"Somehow got Data Product ID: {dp_id}, State: {state}"
-                raise RuntimeError(error_msg)
+        transition(self, dp_id)
 
         # Are we done?
-        all_done: bool = all(
-            dp.state == State.SUCCESS for dp in self.plan.data_products
-        )
+        all_done: bool = set(self._state_by_id.values()) == {State.SUCCESS}
 
         if all_done:
             match self.environment.parsed_options.mode:
@@ -179,6 +273,27 @@ class FletcherUser(HttpUser):
                     sleep(self.environment.parsed_options.restart_delay)
                     self.clear()
 
+    def start_data_product(self, dp_id: UUID) -> None:
+        """Set a data product to running.
+
+        The step is left to process its data until `processing_delay` has passed,
+        without holding up the user in the meantime.
+
+        Args:
+            dp_id: UUID of the data product to start
+
+        """
+        self.update_data_product(dp_id=dp_id, state=State.RUNNING)
+
+    def finish_data_product(self, dp_id: UUID) -> None:
+        """Set a running data product to done.
+
+        Args:
+            dp_id: UUID of the data product to finish
+
+        """
+        self.update_data_product(dp_id=dp_id, state=State.SUCCESS)
+
     def update_data_product(self, dp_id: UUID, state: State) -> None:
         """Update the state of a data product via Fletcher API.
 
@@ -187,26 +302,99 @@ class FletcherUser(HttpUser):
             state: New state to set for the data product
 
         """
-        update_payload: list[dict[str, Any]] = [
-            DataProductPut(id=dp_id, state=state).model_dump(mode="json"),
-        ]
-
-        response: dict[str, Any] = self.client.put(
-            url=f"/api/data_product/{self.plan.dataset.id}/update",
-            json=update_payload,
-            headers={"Authorization": f"Bearer {self.auth.access_token}"},
-        ).json()
-
-        self.plan = Plan.model_validate(response)
+        # Each user repeats the same few transitions, so only serialize them once
+        update_payload: str | None = self._update_payloads.get((dp_id, state))
+        if update_payload is None:
+            update_payload = _DATA_PRODUCT_PUT_ADAPTER.dump_json(
+                [DataProductPut(id=dp_id, state=state)],
+            ).decode()
+            self._update_payloads[dp_id, state] = update_payload
+
+        response: bytes = self.client.put(
+            url=self._update_url,
+            data=update_payload,
+            headers=_JSON_HEADERS,
+        ).content
+
+        # Only the states can change, so skip validating the rest of the plan
+        plan_state: PlanState = PlanState.model_validate_json(response)
+        self._index_states({dp.id: dp.state for dp in plan_state.data_products})
 
     def clear(self) -> None:
         """Clear all data products from the current plan's dataset."""
-        update_payload: list[str] = [str(dp.id) for dp in self.plan.data_products]
+        response: bytes = self.client.put(
+            url=self._clear_url,
+            data=self._clear_payload,
+            headers=_JSON_HEADERS,
+        ).content
+
+        plan_state: PlanState = PlanState.model_validate_json(response)
+        self._index_states({dp.id: dp.state for dp in plan_state.data_products})
+
+    def _index_states(self, states: dict[UUID, State]) -> None:
+        """Index the current state of each data product and re-sort what changed.
+
+        Args:
+            states: Current state of each data product, by data product ID
+
+        """
+        changed: list[UUID] = []
+        for dp_id, state in states.items():
+            old_state: State | None = self._state_by_id.get(dp_id)
+            if old_state is state:
+                continue
+
+            changed.append(dp_id)
+
+            # Children are waiting on one less parent, or one more if we went back
+            if (state is State.SUCCESS) != (old_state is State.SUCCESS):
+                step: int = -1 if state is State.SUCCESS else 1
+                for child_id in self._children_of.get(dp_id, ()):
+                    self._pending_parents[child_id] += step
+
+        self._state_by_id = states
+
+        # A non-eager step's readiness hangs on its parents, so recheck children too
+        affected: set[UUID] = set(changed)
+        for dp_id in changed:
+            affected.update(self._children_of.get(dp_id, ()))
+
+        for dp_id in affected:
+            self._sort_candidate(dp_id)
+
+    def _sort_candidate(self, dp_id: UUID) -> None:
+        """Place a data product in the candidate set matching its current state.
+
+        Args:
+            dp_id: UUID of the data product to re-sort
+
+        """
+        state: State = self._state_by_id[dp_id]
+
+        self._queued_eager.discard(dp_id)
+        self._ready_noneager.discard(dp_id)
+
+        if state is State.RUNNING:
+            # Start the processing clock the first time we see it running
+            self._running.setdefault(dp_id, monotonic())
+            return
+
+        self._running.pop(dp_id, None)
+
+        if dp_id in self._eager_ids:
+            if state is State.QUEUED:
+                self._queued_eager.add(dp_id)
+        elif state is State.WAITING and not self._pending_parents[dp_id]:
+            # All upsteam steps are "success"
+            self._ready_noneager.add(dp_id)
+
 
-        response: dict[str, Any] = self.client.put(
-            url=f"/api/data_product/{self.plan.dataset.id}/clear",
-            json=update_payload,
-            headers={"Authorization": f"Bearer {self.auth.access_token}"},
-        ).json()
+# What to do with a data product, based on its current state
+_TRANSITIONS: dict[State, Callable[[FletcherUser, UUID], None]] = {
+    State.WAITING: FletcherUser.start_data_product,
+    State.QUEUED: FletcherUser.start_data_product,
+    State.RUNNING: FletcherUser.finish_data_product,
+}
 
-        self.plan = Plan.model_validate(response)
+# Each new test gets a fresh shared token, rather than one left from the last test
+events.test_start.add_listener(FletcherUser.reset_shared_auth)
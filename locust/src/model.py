@@ -10,7 +10,7 @@ from enum import StrEnum
 from typing import Any
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class RunMode(StrEnum):
@@ -20,26 +20,14 @@ class RunMode(StrEnum):
     LOOP = "loop"
 
 
-class Role(StrEnum):
-    """Available roles for Fletcher API authentication."""
-
-    DISABLE = "disable"  # Can disable data products
-    PUBLISH = "publish"  # Can publish new data products
-    PAUSE = "pause"  # Can pause data product execution
-    UPDATE = "update"  # Can update existing data products
-
-
 class Auth(BaseModel):
-    """Authentication response model from Fletcher API."""
+    """Authentication response model from Fletcher API.
+
+    Only the access token and its expiry are used, so the rest is skipped.
+    """
 
     access_token: str
     expires: int
-    issued: int
-    issued_by: str
-    roles: list[Role]
-    service: str
-    token_type: str
-    ttl: int
 
 
 class AuthLogin(BaseModel):
@@ -113,9 +101,24 @@ class Plan(BaseModel):
     dependencies: list[Dependency]
 
 
+class DataProductState(BaseModel):
+    """Data product ID and state, skipping the rest of the data product."""
+
+    id: UUID
+    state: State
+
+
+class PlanState(BaseModel):
+    """Data product states of a plan, skipping the rest of the plan."""
+
+    data_products: list[DataProductState]
+
+
 class DatasetPost(BaseModel):
     """Dataset creation/update request model."""
 
+    model_config = ConfigDict(frozen=True)
+
     id: UUID
     paused: bool
     extra: Any
@@ -124,6 +127,8 @@ class DatasetPost(BaseModel):
 class DataProductPost(BaseModel):
     """Data product creation/update request model."""
 
+    model_config = ConfigDict(frozen=True)
+
     id: UUID
     compute: Compute
     name: str
@@ -135,6 +140,8 @@ class DataProductPost(BaseModel):
 class DependencyPost(BaseModel):
     """Dependency creation/update request model."""
 
+    model_config = ConfigDict(frozen=True)
+
     parent_id: UUID
     child_id: UUID
     extra: Any = None
@@ -143,13 +150,17 @@ class DependencyPost(BaseModel):
 class PlanPost(BaseModel):
     """Plan creation request model."""
 
+    model_config = ConfigDict(frozen=True)
+
     dataset: DatasetPost
-    data_products: list[DataProductPost]
-    dependencies: list[DependencyPost]
+    data_products: tuple[DataProductPost, ...]
+    dependencies: tuple[DependencyPost, ...]
 
 
 class DataProductPut(BaseModel):
     """Data product state update request model."""
 
+    model_config = ConfigDict(frozen=True)
+
     id: UUID
     state: State
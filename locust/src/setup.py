@@ -5,11 +5,96 @@ for load testing the Fletcher API. It creates complex plan payloads with
 realistic data product hierarchies and dependencies.
 """
 
-from uuid import UUID, uuid4
+from os import urandom
+from re import escape, split
+from typing import Any
+from uuid import UUID
 
 from model import Compute, DataProductPost, DatasetPost, DependencyPost, PlanPost
 
 
+def uuid4_batch(count: int) -> list[UUID]:
+    """Generate random (version 4) UUIDs from a single draw of random bytes.
+
+    Args:
+        count: How many UUIDs to generate
+
+    Returns:
+        list[UUID]: The new UUIDs
+
+    """
+    raw: bytes = urandom(16 * count)
+
+    return [
+        UUID(bytes=raw[offset : offset + 16], version=4)
+        for offset in range(0, 16 * count, 16)
+    ]
+
+
+def uuid4_str_batch(count: int) -> list[str]:
+    """Generate random (version 4) UUID strings, skipping building UUID objects.
+
+    Args:
+        count: How many UUID strings to generate
+
+    Returns:
+        list[str]: The new UUIDs, in canonical dashed form
+
+    """
+    raw: bytearray = bytearray(urandom(16 * count))
+
+    # Stamp the version (4) and variant (RFC 4122) bits, like UUID(version=4)
+    for offset in range(0, 16 * count, 16):
+        raw[offset + 6] = raw[offset + 6] & 0x0F | 0x40
+        raw[offset + 8] = raw[offset + 8] & 0x3F | 0x80
+
+    hexed: str = raw.hex()
+
+    return [
+        f"{hexed[offset : offset + 8]}-{hexed[offset + 8 : offset + 12]}-"
+        f"{hexed[offset + 12 : offset + 16]}-{hexed[offset + 16 : offset + 20]}-"
+        f"{hexed[offset + 20 : offset + 32]}"
+        for offset in range(0, 32 * count, 32)
+    ]
+
+
+# Data products in the test plan: compute, name, version, eager, passthrough
+_DATA_PRODUCT_SPECS: tuple[tuple[Compute, str, str, bool, Any], ...] = (
+    (Compute.CAMS, "BKPF", "1.0.0", False, None),  # 0
+    (Compute.CAMS, "BSEG", "1.0.0", False, None),  # 1
+    (Compute.CAMS, "T001", "1.0.0", False, None),  # 2
+    (Compute.CAMS, "GLT0", "1.0.0", False, None),  # 3
+    (Compute.CAMS, "EDM_GL", "3.0.0", True, None),  # 4
+    (Compute.CAMS, "EDM_TB", "3.0.0", True, None),  # 5
+    (Compute.CAMS, "Alchemy", "1.0.0", True, None),  # 6
+    (Compute.CAMS, "FSLI Mapping", "1.0.0", False, None),  # 7
+    (Compute.CAMS, "MIDA", "1.0.0", True, None),  # 8
+    (Compute.CAMS, "Journals", "1.0.0", True, {"comp_code": 1000}),  # 9
+    (Compute.CAMS, "Journals", "2.0.0", False, {"comp_code": 2000}),  # 10
+)
+
+# Dependencies in the test plan: parent index, child index, extra. The extra dicts
+# are never mutated, so every plan shares them.
+_DEPENDENCY_SPECS: tuple[tuple[int, int, dict[str, str]], ...] = (
+    (0, 4, {"desc": "BKPF -> EDM_GL"}),
+    (1, 4, {"desc": "BSEG -> EDM_GL"}),
+    (2, 4, {"desc": "T001 -> EDM_GL"}),
+    (1, 5, {"desc": "BSEG -> EDM_TB"}),
+    (2, 5, {"desc": "T001 -> EDM_TB"}),
+    (3, 5, {"desc": "GLT0 -> EDM_TB"}),
+    (4, 6, {"desc": "EDM_GL -> Alchemy"}),
+    (5, 6, {"desc": "EDM_TB -> Alchemy"}),
+    (4, 9, {"desc": "EDM_GL -> Journals:1000"}),
+    (5, 9, {"desc": "EDM_TB -> Journals:1000"}),
+    (7, 9, {"desc": "FSLI Mapping -> Journals:1000"}),
+    (8, 9, {"desc": "MIDA -> Journals:1000"}),
+    (4, 10, {"desc": "EDM_GL -> Journals:2000"}),
+    (5, 10, {"desc": "EDM_TB -> Journals:2000"}),
+    (7, 10, {"desc": "FSLI Mapping -> Journals:2000"}),
+    (8, 10, {"desc": "MIDA -> Journals:2000"}),
+)
+
+
 def generate_plan_payload() -> PlanPost:
     """Generate a complex test plan with multiple data products and dependencies.
 
@@ -17,184 +102,101 @@ def generate_plan_payload() -> PlanPost:
         PlanPost: A plan configuration for testing Fletcher's orchestration capabilities
 
     """
-    dataset_id: UUID = uuid4()
-    bkpf_id: UUID = uuid4()
-    bseg_id: UUID = uuid4()
-    t001_id: UUID = uuid4()
-    glt0_id: UUID = uuid4()
-    edm_gl_id: UUID = uuid4()
-    edm_tb_id: UUID = uuid4()
-    alchemy_id: UUID = uuid4()
-    fsli_id: UUID = uuid4()
-    mida_id: UUID = uuid4()
-    journals_1000_id: UUID = uuid4()
-    journals_2000_id: UUID = uuid4()
+    dataset_id, extra1_id, extra2_id, *dp_ids = uuid4_batch(
+        3 + len(_DATA_PRODUCT_SPECS)
+    )
 
     return PlanPost(
         dataset=DatasetPost(
-            id=dataset_id, paused=False, extra={"extra1": uuid4(), "extra2": uuid4()}
+            id=dataset_id,
+            paused=False,
+            extra={"extra1": extra1_id, "extra2": extra2_id},
         ),
-        data_products=[
-            DataProductPost(
-                id=bkpf_id,
-                compute=Compute.CAMS,
-                name="BKPF",
-                version="1.0.0",
-                eager=False,
-            ),
-            DataProductPost(
-                id=bseg_id,
-                compute=Compute.CAMS,
-                name="BSEG",
-                version="1.0.0",
-                eager=False,
-            ),
-            DataProductPost(
-                id=t001_id,
-                compute=Compute.CAMS,
-                name="T001",
-                version="1.0.0",
-                eager=False,
-            ),
-            DataProductPost(
-                id=glt0_id,
-                compute=Compute.CAMS,
-                name="GLT0",
-                version="1.0.0",
-                eager=False,
-            ),
-            DataProductPost(
-                id=edm_gl_id,
-                compute=Compute.CAMS,
-                name="EDM_GL",
-                version="3.0.0",
-                eager=True,
-            ),
-            DataProductPost(
-                id=edm_tb_id,
-                compute=Compute.CAMS,
-                name="EDM_TB",
-                version="3.0.0",
-                eager=True,
-            ),
-            DataProductPost(
-                id=alchemy_id,
-                compute=Compute.CAMS,
-                name="Alchemy",
-                version="1.0.0",
-                eager=True,
-            ),
+        data_products=tuple(
             DataProductPost(
-                id=fsli_id,
-                compute=Compute.CAMS,
-                name="FSLI Mapping",
-                version="1.0.0",
-                eager=False,
-            ),
-            DataProductPost(
-                id=mida_id,
-                compute=Compute.CAMS,
-                name="MIDA",
-                version="1.0.0",
-                eager=True,
-            ),
-            DataProductPost(
-                id=journals_1000_id,
-                compute=Compute.CAMS,
-                name="Journals",
-                version="1.0.0",
-                eager=True,
-                passthrough={"comp_code": 1000},
-            ),
-            DataProductPost(
-                id=journals_2000_id,
-                compute=Compute.CAMS,
-                name="Journals",
-                version="2.0.0",
-                eager=False,
-                passthrough={"comp_code": 2000},
-            ),
-        ],
-        dependencies=[
-            DependencyPost(
-                parent_id=bkpf_id,
-                child_id=edm_gl_id,
-                extra={"desc": "BKPF -> EDM_GL"},
-            ),
-            DependencyPost(
-                parent_id=bseg_id,
-                child_id=edm_gl_id,
-                extra={"desc": "BSEG -> EDM_GL"},
-            ),
-            DependencyPost(
-                parent_id=t001_id,
-                child_id=edm_gl_id,
-                extra={"desc": "T001 -> EDM_GL"},
-            ),
-            DependencyPost(
-                parent_id=bseg_id,
-                child_id=edm_tb_id,
-                extra={"desc": "BSEG -> EDM_TB"},
-            ),
-            DependencyPost(
-                parent_id=t001_id,
-                child_id=edm_tb_id,
-                extra={"desc": "T001 -> EDM_TB"},
-            ),
-            DependencyPost(
-                parent_id=glt0_id,
-                child_id=edm_tb_id,
-                extra={"desc": "GLT0 -> EDM_TB"},
-            ),
-            DependencyPost(
-                parent_id=edm_gl_id,
-                child_id=alchemy_id,
-                extra={"desc": "EDM_GL -> Alchemy"},
-            ),
-            DependencyPost(
-                parent_id=edm_tb_id,
-                child_id=alchemy_id,
-                extra={"desc": "EDM_TB -> Alchemy"},
-            ),
-            DependencyPost(
-                parent_id=edm_gl_id,
-                child_id=journals_1000_id,
-                extra={"desc": "EDM_GL -> Journals:1000"},
-            ),
-            DependencyPost(
-                parent_id=edm_tb_id,
-                child_id=journals_1000_id,
-                extra={"desc": "EDM_TB -> Journals:1000"},
-            ),
-            DependencyPost(
-                parent_id=fsli_id,
-                child_id=journals_1000_id,
-                extra={"desc": "FSLI Mapping -> Journals:1000"},
-            ),
-            DependencyPost(
-                parent_id=mida_id,
-                child_id=journals_1000_id,
-                extra={"desc": "MIDA -> Journals:1000"},
-            ),
-            DependencyPost(
-                parent_id=edm_gl_id,
-                child_id=journals_2000_id,
-                extra={"desc": "EDM_GL -> Journals:2000"},
-            ),
-            DependencyPost(
-                parent_id=edm_tb_id,
-                child_id=journals_2000_id,
-                extra={"desc": "EDM_TB -> Journals:2000"},
-            ),
-            DependencyPost(
-                parent_id=fsli_id,
-                child_id=journals_2000_id,
-                extra={"desc": "FSLI Mapping -> Journals:2000"},
-            ),
+                id=dp_id,
+                compute=compute,
+                name=name,
+                version=version,
+                eager=eager,
+                passthrough=passthrough,
+            )
+            for dp_id, (compute, name, version, eager, passthrough) in zip(
+                dp_ids, _DATA_PRODUCT_SPECS, strict=True
+            )
+        ),
+        dependencies=tuple(
             DependencyPost(
-                parent_id=mida_id,
-                child_id=journals_2000_id,
-                extra={"desc": "MIDA -> Journals:2000"},
-            ),
-        ],
+                parent_id=dp_ids[parent],
+                child_id=dp_ids[child],
+                extra=extra,
+            )
+            for parent, child, extra in _DEPENDENCY_SPECS
+        ),
+    )
+
+
+def _split_template(
+    plan: PlanPost, ids: tuple[str, ...]
+) -> tuple[tuple[str, ...], tuple[int, ...]]:
+    """Render a plan to JSON, split around every place one of its IDs shows up.
+
+    Args:
+        plan: Plan to render
+        ids: IDs in the plan to split around
+
+    Returns:
+        tuple[tuple[str, ...], tuple[int, ...]]: JSON pieces, with each ID left in
+            every odd slot, and the index into `ids` of the ID in each of those slots
+
+    """
+    pieces: list[str] = split(
+        f"({'|'.join(escape(plan_id) for plan_id in ids)})",
+        plan.model_dump_json(),
     )
+    id_index: dict[str, int] = {plan_id: index for index, plan_id in enumerate(ids)}
+
+    return tuple(pieces), tuple(id_index[plan_id] for plan_id in pieces[1::2])
+
+
+# Plan skeleton, rendered to JSON pieces once. Each new plan only splices in IDs.
+_PLAN_SKELETON: PlanPost = generate_plan_payload()
+_SKELETON_IDS: tuple[str, ...] = (
+    str(_PLAN_SKELETON.dataset.id),
+    *(str(value) for value in _PLAN_SKELETON.dataset.extra.values()),
+    *(str(dp.id) for dp in _PLAN_SKELETON.data_products),
+)
+_PLAN_PIECES, _PLAN_ID_SLOTS = _split_template(_PLAN_SKELETON, _SKELETON_IDS)
+
+
+def generate_plan_bodies(count: int) -> list[str]:
+    """Generate the JSON bodies of several new test plans from one draw of IDs.
+
+    Args:
+        count: How many plan bodies to generate
+
+    Returns:
+        list[str]: JSON encoded plans, shaped like `generate_plan_payload` with
+            fresh IDs
+
+    """
+    id_count: int = len(_SKELETON_IDS)
+    new_ids: list[str] = uuid4_str_batch(count * id_count)
+
+    bodies: list[str] = []
+    for start in range(0, count * id_count, id_count):
+        body: list[str] = list(_PLAN_PIECES)
+        body[1::2] = [new_ids[start + index] for index in _PLAN_ID_SLOTS]
+        bodies.append("".join(body))
+
+    return bodies
+
+
+def generate_plan_body() -> str:
+    """Generate the JSON body of a new test plan without rebuilding its models.
+
+    Returns:
+        str: JSON encoded plan, shaped like `generate_plan_payload` with fresh IDs
+
+    """
+    return generate_plan_bodies(1)[0]